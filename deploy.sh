@@ -17,7 +17,7 @@ NC='\033[0m' # No Color
 
 # 显示欢迎信息
 show_welcome() {
-    clear
+    printf '\033[H\033[2J'
     echo -e "${CYAN}╔══════════════════════════════════════════════════════════════════╗${NC}"
     echo -e "${CYAN}║                     ${WHITE}MTProxy 交互式部署工具${CYAN}                      ║${NC}"
     echo -e "${CYAN}║                                                                  ║${NC}"
@@ -35,7 +35,7 @@ show_system_info() {
     echo -e "   内核版本: $(uname -r)"
     echo -e "   架构信息: $(uname -m)"
     echo -e "   当前用户: $(whoami)"
-    echo -e "   服务器IP: $(curl -s ifconfig.me 2>/dev/null || echo '获取失败')"
+    echo -e "   服务器IP: $(curl -s -m 10 ifconfig.me 2>/dev/null || echo '获取失败')"
     echo ""
 }
 
@@ -68,7 +68,6 @@ check_system() {
     
     echo -e "${GREEN}✅ 系统检查完成${NC}"
     echo ""
-    echo -e "${CYAN}DEBUG: check_system 函数执行完成${NC}" >&2
 }
 
 # 用户确认
@@ -121,11 +120,11 @@ show_progress() {
     local percent=$((step * 100 / total))
     local filled=$((step * 50 / total))
     local empty=$((50 - filled))
+    local bar_filled bar_empty
     
-    printf "\r${BLUE}[%3d%%]${NC} [" $percent
-    printf "%${filled}s" | tr ' ' '█'
-    printf "%${empty}s" | tr ' ' '░'
-    printf "] ${desc}"
+    printf -v bar_filled "%${filled}s" ""
+    printf -v bar_empty "%${empty}s" ""
+    printf "\r${BLUE}[%3d%%]${NC} [%s%s] %s" $percent "${bar_filled// /█}" "${bar_empty// /░}" "$desc"
     
     if [ $step -eq $total ]; then
         echo ""
@@ -143,7 +142,6 @@ main_install() {
     show_progress 1 4 "创建安装目录..."
     mkdir -p $INSTALL_DIR
     cd $INSTALL_DIR
-    sleep 1
     
     # 步骤2: 下载脚本
     show_progress 2 4 "下载核心脚本..."
@@ -153,11 +151,9 @@ main_install() {
         echo -e "\n${RED}❌ 下载失败，请检查网络连接${NC}"
         exit 1
     fi
-    sleep 1
     
     # 步骤3: 准备安装
     show_progress 3 4 "准备安装环境..."
-    sleep 1
     
     # 步骤4: 开始交互式安装
     show_progress 4 4 "启动交互式安装..."
@@ -229,21 +225,13 @@ show_completion() {
 
 # 主函数
 main() {
-    echo -e "${CYAN}DEBUG: 开始执行主函数${NC}" >&2
     show_welcome
-    echo -e "${CYAN}DEBUG: show_welcome 完成${NC}" >&2
     show_system_info
-    echo -e "${CYAN}DEBUG: show_system_info 完成${NC}" >&2
     check_root
-    echo -e "${CYAN}DEBUG: check_root 完成${NC}" >&2
     check_system
-    echo -e "${CYAN}DEBUG: check_system 完成${NC}" >&2
     confirm_install
-    echo -e "${CYAN}DEBUG: confirm_install 完成${NC}" >&2
     main_install
-    echo -e "${CYAN}DEBUG: main_install 完成${NC}" >&2
     show_completion
-    echo -e "${CYAN}DEBUG: show_completion 完成${NC}" >&2
 }
 
 # 执行主函数
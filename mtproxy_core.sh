@@ -53,22 +53,31 @@ function abs() {
 }
 
 function get_ip_public() {
-    public_ip=$(curl -s https://api.ip.sb/ip -A Mozilla --ipv4)
-    [ -z "$public_ip" ] && public_ip=$(curl -s ipinfo.io/ip -A Mozilla --ipv4)
+    if [ -n "$public_ip_cache" ]; then
+        echo $public_ip_cache
+        return
+    fi
+    public_ip=$(curl -s -m 10 https://api.ip.sb/ip -A Mozilla --ipv4)
+    [ -z "$public_ip" ] && public_ip=$(curl -s -m 10 ipinfo.io/ip -A Mozilla --ipv4)
     echo $public_ip
 }
 
+function load_ip_public() {
+    # resolve once in the calling shell; later $(get_ip_public) subshells reuse it
+    if [ -z "$public_ip_cache" ]; then
+        public_ip_cache=$(get_ip_public)
+    fi
+}
+
 function get_ip_private() {
-    echo $(ip a | grep inet | grep -v 127.0.0.1 | grep -v inet6 | awk '{print $2}' | cut -d "/" -f1 | awk 'NR==1 {print $1}')
+    ip a | awk '/inet / && !/127\.0\.0\.1/ {split($2, a, "/"); print a[1]; exit}'
 }
 
 function get_local_ip(){
-  ip a | grep inet | grep 127.0.0.1 > /dev/null 2>&1
-  if [[ $? -eq 1 ]];then
-    echo $(get_ip_private)
-  else
-    echo "127.0.0.1"
-  fi
+  # one snapshot of the interface list: loopback if present, else first private ip
+  ip a | awk '/inet/ && /127\.0\.0\.1/ {lo = 1}
+    /inet / && !/127\.0\.0\.1/ && !ip {split($2, a, "/"); ip = a[1]}
+    END {print (lo ? "127.0.0.1" : ip)}'
 }
 
 function get_nat_ip_param() {
@@ -82,7 +91,7 @@ function get_nat_ip_param() {
 }
 
 function get_cpu_core() {
-    echo $(cat /proc/cpuinfo | grep "processor" | wc -l)
+    nproc
 }
 
 function get_architecture() {
@@ -167,7 +176,7 @@ function build_mtproto() {
 }
 
 function get_mtg_provider() {
-    source ./mtp_config
+    load_config || exit 1
 
     local arch=$(get_architecture)
     if [[ "$arch" != "amd64" && $provider -eq 1 ]]; then
@@ -184,6 +193,16 @@ function get_mtg_provider() {
     fi
 }
 
+function load_config() {
+    # sourced once per run; subshells inherit the values
+    [[ -n "$config_loaded" ]] && return 0
+    source "$WORKDIR/mtp_config" || return 1
+    local domain_hex
+    str_to_hex domain_hex "$domain"
+    client_secret="ee${secret}${domain_hex}"
+    config_loaded=1
+}
+
 function is_installed() {
     if [ ! -f "$WORKDIR/mtp_config" ]; then
         return 1
@@ -192,32 +211,25 @@ function is_installed() {
 }
 
 
-function kill_process_by_port() {
-    pids=$(get_pids_by_port $1)
-    if [ -n "$pids" ]; then
-        kill -9 $pids
-    fi
-}
-
 function get_pids_by_port() {
-    echo $(netstat -tulpn 2>/dev/null | grep ":$1 " | awk '{print $7}' | sed 's|/.*||')
+    # an empty "sport = :" filter would match every listening socket
+    [[ $1 =~ ^[0-9]+$ ]] || return 1
+    ss -tulnp "sport = :$1" 2>/dev/null | grep -o 'pid=[0-9]*' | cut -d= -f2 | sort -u
 }
 
 function is_port_open() {
-    pids=$(get_pids_by_port $1)
-
-    if [ -n "$pids" ]; then
-        return 0
-    else
-        return 1
-    fi
+    [[ $1 =~ ^[0-9]+$ ]] || return 1
+    # any socket row after the header means something is listening
+    ss -tuln "sport = :$1" 2>/dev/null | awk 'NR > 1 {found = 1} END {exit !found}'
 }
 
 
 function is_running_mtp() {
     if [ -f $pid_file ]; then
+        local pid
+        read -r pid <$pid_file
 
-        if is_pid_exists $(cat $pid_file); then
+        if is_pid_exists $pid; then
             return 0
         fi
     fi
@@ -234,12 +246,10 @@ function is_supported_official_version() {
 }
 
 function is_pid_exists() {
-    # check_ps_not_install_to_install
-    local exists=$(ps aux | awk '{print $2}' | grep -w $1)
-    if [[ ! $exists ]]; then
-        return 1
-    else
+    if [[ $1 =~ ^[0-9]+$ && -d /proc/$1 ]]; then
         return 0
+    else
+        return 1
     fi
 }
 
@@ -272,22 +282,24 @@ print_line() {
 
 do_kill_process() {
     cd $WORKDIR
-    source ./mtp_config
+    load_config || return 1
 
-    if is_port_open $port; then
+    local pids=$(get_pids_by_port $port)
+    if [ -n "$pids" ]; then
         echo "检测到端口 $port 被占用, 准备杀死进程!"
-        kill_process_by_port $port
+        kill -9 $pids
     fi
     
-    if is_port_open $web_port; then
+    pids=$(get_pids_by_port $web_port)
+    if [ -n "$pids" ]; then
         echo "检测到端口 $web_port 被占用, 准备杀死进程!"
-        kill_process_by_port $web_port
+        kill -9 $pids
     fi
 }
 
 do_check_system_datetime_and_update() {
-    dateFromLocal=$(date +%s)
-    dateFromServer=$(date -d "$(curl -v --silent ip.sb 2>&1 | grep Date | sed -e 's/< Date: //')" +%s)
+    printf -v dateFromLocal '%(%s)T' -1
+    dateFromServer=$(date -d "$(curl -v --silent -m 10 ip.sb 2>&1 | sed -n 's/^< [Dd]ate: //p')" +%s)
     offset=$(abs $(( "$dateFromServer" - "$dateFromLocal")))
     tolerance=60
     if [ "$offset" -gt "$tolerance" ];then
@@ -329,10 +341,9 @@ do_config_mtp() {
             echo -e "\n[\033[33m提醒\033[0m] 你的系统不支持官方版本\n"
         fi
 
-        read -p "(默认版本: ${default_provider}):" input_provider
+        read -e -p "(默认版本: ${default_provider}):" input_provider
         [ -z "${input_provider}" ] && input_provider=${default_provider}
-        expr ${input_provider} + 1 &>/dev/null
-        if [ $? -eq 0 ]; then
+        if [[ ${input_provider} =~ ^[0-9]+$ ]]; then
             if [ ${input_provider} -ge 1 ] && [ ${input_provider} -le 2 ] && [ ${input_provider:0:1} != 0 ]; then
                 echo
                 echo "---------------------------"
@@ -348,10 +359,9 @@ do_config_mtp() {
     while true; do
         default_port=443
         echo -e "请输入一个客户端连接端口 [1-65535]"
-        read -p "(默认端口: ${default_port}):" input_port
+        read -e -p "(默认端口: ${default_port}):" input_port
         [ -z "${input_port}" ] && input_port=${default_port}
-        expr ${input_port} + 1 &>/dev/null
-        if [ $? -eq 0 ]; then
+        if [[ ${input_port} =~ ^[0-9]+$ ]]; then
             if [ ${input_port} -ge 1 ] && [ ${input_port} -le 65535 ] && [ ${input_port:0:1} != 0 ]; then
                 echo
                 echo "---------------------------"
@@ -368,10 +378,9 @@ do_config_mtp() {
     while true; do
         default_manage=8888
         echo -e "请输入一个管理端口 [1-65535]"
-        read -p "(默认端口: ${default_manage}):" input_manage_port
+        read -e -p "(默认端口: ${default_manage}):" input_manage_port
         [ -z "${input_manage_port}" ] && input_manage_port=${default_manage}
-        expr ${input_manage_port} + 1 &>/dev/null
-        if [ $? -eq 0 ] && [ $input_manage_port -ne $input_port ]; then
+        if [[ ${input_manage_port} =~ ^[0-9]+$ ]] && [ $input_manage_port -ne $input_port ]; then
             if [ ${input_manage_port} -ge 1 ] && [ ${input_manage_port} -le 65535 ] && [ ${input_manage_port:0:1} != 0 ]; then
                 echo
                 echo "---------------------------"
@@ -388,22 +397,25 @@ do_config_mtp() {
     while true; do
         default_domain="azure.microsoft.com"
         echo -e "请输入一个需要伪装的域名："
-        read -p "(默认域名: ${default_domain}):" input_domain
+        read -e -p "(默认域名: ${default_domain}):" input_domain
         [ -z "${input_domain}" ] && input_domain=${default_domain}
         http_code=$(curl -I -m 10 -o /dev/null -s -w %{http_code} $input_domain)
-        if [ $http_code -eq "200" ] || [ $http_code -eq "302" ] || [ $http_code -eq "301" ]; then
+        case $http_code in
+        200 | 301 | 302)
             echo
             echo "---------------------------"
             echo "伪装域名 = ${input_domain}"
             echo "---------------------------"
             echo
             break
-        fi
+            ;;
+        esac
         echo -e "[\033[33m状态码：${http_code}错误\033[0m] 域名无法访问,请重新输入或更换域名!"
     done
 
     # config info
-    public_ip=$(get_ip_public)
+    load_ip_public
+    public_ip=$public_ip_cache
     secret=$(gen_rand_hex 32)
 
     # proxy tag
@@ -414,7 +426,7 @@ do_config_mtp() {
         echo -e "IP: ${public_ip}"
         echo -e "PORT: ${input_port}"
         echo -e "SECRET(可以随便填): ${secret}"
-        read -p "(留空则跳过):" input_tag
+        read -e -p "(留空则跳过):" input_tag
         [ -z "${input_tag}" ] && input_tag=${default_tag}
         if [ -z "$input_tag" ] || [[ "$input_tag" =~ ^[A-Za-z0-9]{32}$ ]]; then
             echo
@@ -436,28 +448,32 @@ domain="${input_domain}"
 proxy_tag="${input_tag}"
 provider=${input_provider}
 EOF
+    config_loaded=""
     echo -e "配置已经生成完毕!"
 }
 
 function str_to_hex() {
-    string=$1
-    hex=$(printf "%s" "$string" | od -An -tx1 | tr -d ' \n')
-    echo $hex
+    # str_to_hex <var> <string>: stores the hex in <var>, no subshell needed.
+    # byte-wise in the C locale so multibyte input encodes like od -tx1
+    local LC_ALL=C
+    local _str=$2 _hex="" _i
+    for ((_i = 0; _i < ${#_str}; _i++)); do
+        printf -v _hex '%s%02x' "$_hex" "'${_str:_i:1}"
+    done
+    printf -v "$1" '%s' "$_hex"
 }
 
 function gen_rand_hex() {
-    local result=$(dd if=/dev/urandom bs=1 count=500 status=none | od -An -tx1 | tr -d ' \n')
+    local result=$(od -An -N$(( ($1 + 1) / 2 )) -tx1 /dev/urandom | tr -d ' \n')
     echo "${result:0:$1}"
 }
 
 info_mtp() {
     if [[ "$1" == "ingore" ]] || is_running_mtp; then
-        source ./mtp_config
-        public_ip=$(get_ip_public)
+        load_config
+        load_ip_public
+        public_ip=$public_ip_cache
 
-        domain_hex=$(str_to_hex $domain)
-
-        client_secret="ee${secret}${domain_hex}"
         echo -e "TMProxy+TLS代理: \033[32m运行中\033[0m"
         echo -e "服务器IP：\033[31m$public_ip\033[0m"
         echo -e "服务器端口：\033[31m$port\033[0m"
@@ -471,11 +487,9 @@ info_mtp() {
 
 function get_run_command(){
   cd $WORKDIR
+  load_config || return 1
   mtg_provider=$(get_mtg_provider)
-  source ./mtp_config
   if [[ "$mtg_provider" == "mtg" ]]; then
-      domain_hex=$(str_to_hex $domain)
-      client_secret="ee${secret}${domain_hex}"
       local local_ip=$(get_local_ip)
       public_ip=$(get_ip_public)
       
@@ -483,8 +497,9 @@ function get_run_command(){
       [[ -f "./mtg" ]] || (echo -e "提醒：\033[33m MTProxy 代理程序不存在请重新安装! \033[0m" && exit 1)
       echo "./mtg run $client_secret $proxy_tag -b 0.0.0.0:$port --multiplex-per-connection 500 --prefer-ip=ipv6 -t $local_ip:$web_port" -4 "$public_ip:$port"
   else
-      curl -s https://core.telegram.org/getProxyConfig -o proxy-multi.conf
-      curl -s https://core.telegram.org/getProxySecret -o proxy-secret
+      # one curl for both files so the second request reuses the TLS connection
+      curl -s -m 10 https://core.telegram.org/getProxyConfig -o proxy-multi.conf \
+          https://core.telegram.org/getProxySecret -o proxy-secret
       nat_info=$(get_nat_ip_param)
       workerman=$(get_cpu_core)
       tag_arg=""
@@ -499,15 +514,30 @@ run_mtp() {
     if is_running_mtp; then
         echo -e "提醒：\033[33mMTProxy已经运行，请勿重复运行!\033[0m"
     else
-        do_kill_process
+        do_kill_process || return 1
         do_check_system_datetime_and_update
 
+        load_ip_public
         local command=$(get_run_command)
         echo $command
         $command >/dev/null 2>&1 &
 
-        echo $! >$pid_file
-        sleep 2
+        local pid=$!
+        echo $pid >$pid_file
+
+        # poll until our process owns the port (or has died), at most 2s
+        local i
+        for i in {1..20}; do
+            if ! is_pid_exists $pid; then
+                break
+            fi
+            if is_port_open $port && get_pids_by_port $port | grep -qx "$pid"; then
+                # settle briefly so a bind-then-crash is caught by info_mtp
+                sleep 0.5
+                break
+            fi
+            sleep 0.1
+        done
         info_mtp
     fi
 }
@@ -519,9 +549,10 @@ daemon_mtp() {
     if is_running_mtp; then
         echo -e "提醒：\033[33mMTProxy已经运行，请勿重复运行!\033[0m"
     else
-        do_kill_process
+        do_kill_process || return 1
         do_check_system_datetime_and_update
 
+        load_ip_public
         local command=$(get_run_command)
         echo $command
         while true
@@ -543,9 +574,10 @@ debug_mtp() {
     echo "当前正在运行调试模式："
     echo -e "\t你随时可以通过 Ctrl+C 进行取消操作"
 
-    do_kill_process
+    do_kill_process || return 1
     do_check_system_datetime_and_update
 
+    load_ip_public
     local command=$(get_run_command)
     echo $command
     $command
@@ -553,9 +585,13 @@ debug_mtp() {
 }
 
 stop_mtp() {
-    local pid=$(cat $pid_file)
+    local pid
+    read -r pid <$pid_file
     kill -9 $pid
 
+    # block until the process is gone rather than racing the kill
+    timeout 5 tail --pid=$pid -s 0.1 -f /dev/null 2>/dev/null
+
     if is_pid_exists $pid; then
         echo "停止任务失败"
     fi
@@ -567,7 +603,7 @@ reinstall_mtp() {
         while true; do
             default_keep_config="y"
             echo -e "是否保留配置文件? "
-            read -p "y: 保留 , n: 不保留 (默认: ${default_keep_config}):" input_keep_config
+            read -e -p "y: 保留 , n: 不保留 (默认: ${default_keep_config}):" input_keep_config
             [ -z "${input_keep_config}" ] && input_keep_config=${default_keep_config}
 
             if [[ "$input_keep_config" == "y" ]] || [[ "$input_keep_config" == "n" ]]; then
@@ -591,32 +627,39 @@ reinstall_mtp() {
 
 param=$1
 
-if [[ "start" == $param ]]; then
+case "$param" in
+start)
     echo "即将：启动脚本"
     run_mtp
-elif [[ "daemon" == $param ]]; then
+    ;;
+daemon)
     echo "即将：启动脚本(守护进程)"
     daemon_mtp
-elif [[ "stop" == $param ]]; then
+    ;;
+stop)
     echo "即将：停止脚本"
     stop_mtp
-elif [[ "debug" == $param ]]; then
+    ;;
+debug)
     echo "即将：调试运行"
     debug_mtp
-elif [[ "restart" == $param ]]; then
+    ;;
+restart)
     stop_mtp
     run_mtp
-    debug_mtp
-elif [[ "reinstall" == $param ]]; then
+    ;;
+reinstall)
     reinstall_mtp
-elif [[ "build" == $param ]]; then
+    ;;
+build)
     arch=$(get_architecture)
     if [[ "$arch" == "amd64" ]]; then
         build_mtproto 1
     fi
     
      build_mtproto 2
-else
+    ;;
+*)
     if ! is_installed; then
         echo "MTProxyTLS一键安装运行绿色脚本"
         print_line
@@ -642,4 +685,5 @@ else
         echo -e "\t重启服务\t bash $0 restart"
         echo -e "\t重新安装代理程序 bash $0 reinstall"
     fi
-fi
+    ;;
+esac
@@ -31,7 +31,7 @@ if [[ $EUID -ne 0 ]]; then
 fi
 
 # 获取服务器IP
-SERVER_IP=$(curl -s ifconfig.me 2>/dev/null || curl -s ipinfo.io/ip 2>/dev/null || echo "127.0.0.1")
+SERVER_IP=$(curl -s -m 10 ifconfig.me 2>/dev/null || curl -s -m 10 ipinfo.io/ip 2>/dev/null || echo "127.0.0.1")
 echo -e "${BLUE}📡 服务器IP: ${WHITE}$SERVER_IP${NC}"
 
 # 创建安装目录